@@ -1,9 +1,12 @@
 # app.py
 from datetime import date, timedelta
 import streamlit as st
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import locale
 
 st.set_page_config(page_title="Calculadora Renda Fixa", layout="wide")
@@ -16,61 +19,100 @@ except:
 
 # --- Funções auxiliares ---
 
+@st.cache_resource
+def _sessao_http():
+    """Sessão HTTP compartilhada entre execuções (evita novo handshake TCP/TLS a cada busca)."""
+    sessao = requests.Session()
+    # Não repete timeouts de leitura, para não multiplicar a espera da interface
+    sessao.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4,
+                                         max_retries=Retry(total=2, read=0, backoff_factor=0.2)))
+    return sessao
+
+# Troca separadores de milhar e decimal em uma única passada
+_MOEDA_TR = str.maketrans({",": ".", ".": ","})
+
 def formatar_moeda(valor: float) -> str:
     """Formata número como moeda brasileira (R$ 1.234,56)."""
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return "R$ " + f"{valor:,.2f}".translate(_MOEDA_TR)
 
-def buscar_cdi():
+@st.cache_data(ttl=3600, show_spinner=False)
+def _buscar_cdi_bcb():
     """
     Busca o CDI diário via API do Banco Central (série SGS 12)
     e converte para taxa anual (% a.a.).
+
+    Erros são propagados: o Streamlit não guarda exceções em cache, então
+    uma falha é tentada de novo na próxima execução.
     """
     url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados/ultimos/1?formato=json"
+    resp = _sessao_http().get(url, timeout=(2, 5))
+    resp.raise_for_status()
+    dados = resp.json()
+    valor_str = dados[0]["valor"]
+    cdi_diario_pct = float(valor_str.replace(",", "."))
+    cdi_diario = cdi_diario_pct / 100.0
+    cdi_anual = (1 + cdi_diario) ** 252 - 1
+    return cdi_anual * 100  # em %
+
+def buscar_cdi():
+    """CDI anual (% a.a.) do Banco Central, ou None se a busca falhar."""
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        dados = resp.json()
-        valor_str = dados[0]["valor"]
-        cdi_diario_pct = float(valor_str.replace(",", "."))
-        cdi_diario = cdi_diario_pct / 100.0
-        cdi_anual = (1 + cdi_diario) ** 252 - 1
-        return cdi_anual * 100  # em %
+        return _buscar_cdi_bcb()
     except Exception:
         return None
 
 def calcular_prazo_em_dias(start_date, end_date):
     return (end_date - start_date).days
 
+# Tabela regressiva do IR: limites de prazo (dias) e alíquota de cada faixa
+_IR_BINS = np.array([180, 360, 720])
+_IR_RATES = np.array([0.225, 0.20, 0.175, 0.15])
+
 def obter_aliquota_ir(prazo_dias):
-    if prazo_dias <= 180:
-        return 0.225
-    elif prazo_dias <= 360:
-        return 0.20
-    elif prazo_dias <= 720:
-        return 0.175
-    else:
-        return 0.15
+    """Alíquota de IR para o prazo; aceita um número ou um array de dias."""
+    aliquota = _IR_RATES[np.searchsorted(_IR_BINS, prazo_dias)]
+    return float(aliquota) if np.ndim(aliquota) == 0 else aliquota
 
 def aliquota_iof(dias):
-    """Tabela regressiva IOF (0 a 30 dias)."""
-    if dias >= 30:
-        return 0.0
-    return (30 - dias) / 30
+    """Tabela regressiva IOF (0 a 30 dias); aceita um número ou um array de dias."""
+    dias = np.asarray(dias)
+    aliquota = np.where(dias < 30, (30 - dias) / 30, 0.0)
+    return float(aliquota) if np.ndim(aliquota) == 0 else aliquota
+
+def _taxa_efetiva(tipo, taxa_anual=None, cdi=None, percentual_cdi=None):
+    """Taxa anual (%) do produto: a taxa pré-fixada ou o percentual do CDI."""
+    if tipo == "Pré":
+        return taxa_anual or 0.0
+    return (percentual_cdi or 0.0) / 100 * (cdi or 0.0)
 
 def calcular_rendimento(valor_investido, taxa_anual_percent, prazo_dias):
     taxa_anual = taxa_anual_percent / 100.0
-    taxa_diaria = (1 + taxa_anual) ** (1/365)
-    return valor_investido * (taxa_diaria ** prazo_dias)
+    return valor_investido * (1 + taxa_anual) ** (prazo_dias / 365.0)
 
+@st.cache_data(max_entries=128, show_spinner=False)
 def calcular_investimento(data_inicio, data_fim, produto, tipo, valor_investido,
                           taxa_anual=None, cdi=None, percentual_cdi=None, taxa_custodia=0.0):
     prazo = calcular_prazo_em_dias(data_inicio, data_fim)
     tributavel = (produto == "CDB")
 
-    if tipo == "Pré":
-        taxa_efetiva = taxa_anual or 0.0
-    else:
-        taxa_efetiva = (percentual_cdi or 0.0) / 100 * (cdi or 0.0)
+    taxa_efetiva = _taxa_efetiva(tipo, taxa_anual, cdi, percentual_cdi)
+
+    # Sem prazo não há rendimento nem custos: evita o cálculo da potência
+    if prazo <= 0:
+        return {
+            "produto": produto,
+            "tipo": tipo,
+            "taxa": taxa_efetiva,
+            "prazo": prazo,
+            "valor_investido": valor_investido,
+            "valor_bruto": valor_investido,
+            "iof": 0.0,
+            "imposto_ir": 0.0,
+            "custodia": 0.0,
+            "valor_liquido": valor_investido,
+            "rentabilidade": 0.0,
+            "rentabilidade_anual": 0.0
+        }
 
     bruto = calcular_rendimento(valor_investido, taxa_efetiva, prazo)
     rendimento = bruto - valor_investido
@@ -88,7 +130,7 @@ def calcular_investimento(data_inicio, data_fim, produto, tipo, valor_investido,
 
     liquido = bruto - imposto_ir - iof - custo_custodia
     rent_liq_pct = (liquido/valor_investido - 1) * 100 if valor_investido > 0 else 0
-    rent_anual_pct = ((1 + rent_liq_pct/100) ** (365/prazo) - 1) * 100 if prazo > 0 else 0
+    rent_anual_pct = ((1 + rent_liq_pct/100) ** (365/prazo) - 1) * 100
 
     return {
         "produto": produto,
@@ -105,15 +147,40 @@ def calcular_investimento(data_inicio, data_fim, produto, tipo, valor_investido,
         "rentabilidade_anual": rent_anual_pct
     }
 
+# Número máximo de pontos desenhados no gráfico de evolução
+_PONTOS_GRAFICO = 400
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def calcular_evolucao(valor_investido, taxa_anual, prazo, produto, tipo, cdi=None, percentual_cdi=None, taxa_custodia=0.0):
+    """Série (dias, valor líquido) usada no gráfico de evolução."""
+    tributavel = (produto == "CDB")
+
+    taxa_efetiva = _taxa_efetiva(tipo, taxa_anual, cdi, percentual_cdi)
+
+    # Calcula a evolução de uma só vez (vetorizado), em vez de chamar
+    # calcular_investimento para cada dia do prazo. Prazos longos são
+    # amostrados em no máximo _PONTOS_GRAFICO dias: a figura não tem
+    # resolução para mostrar mais pontos que isso.
+    n = min(prazo, _PONTOS_GRAFICO)
+    dias = np.unique(np.rint(np.linspace(1, prazo, n)).astype(np.int32))
+    bruto = valor_investido * np.power(1 + taxa_efetiva / 100.0, dias / 365.0)
+    rendimento = bruto - valor_investido
+
+    iof = np.zeros_like(bruto)
+    imposto_ir = np.zeros_like(bruto)
+    if tributavel:
+        iof = rendimento * aliquota_iof(dias)
+        imposto_ir = (rendimento - iof) * obter_aliquota_ir(dias)
+
+    custo_custodia = valor_investido * (taxa_custodia/100) * (dias/365)
+
+    valores_liq = bruto - imposto_ir - iof - custo_custodia
+    return dias, valores_liq
+
 def gerar_grafico(valor_investido, taxa_anual, prazo, produto, tipo, cdi=None, percentual_cdi=None, taxa_custodia=0.0):
-    dias = list(range(1, prazo + 1))
-    valores_liq = []
-    for d in dias:
-        parcial = calcular_investimento(
-            date.today(), date.today() + timedelta(days=d), produto, tipo, valor_investido,
-            taxa_anual=taxa_anual, cdi=cdi, percentual_cdi=percentual_cdi, taxa_custodia=taxa_custodia
-        )
-        valores_liq.append(parcial["valor_liquido"])
+    dias, valores_liq = calcular_evolucao(
+        valor_investido, taxa_anual, prazo, produto, tipo, cdi, percentual_cdi, taxa_custodia
+    )
     fig, ax = plt.subplots(figsize=(7, 4))
     ax.plot(dias, valores_liq, label="Valor Líquido")
     ax.set_title("Evolução do Investimento")
@@ -177,18 +244,16 @@ with st.expander("💰 Configurações do Investimento", expanded=True):
             inv2 = calcular_investimento(*p2)
             
             with st.expander("📊 Comparativo dos Investimentos", expanded=True):
-                df = pd.DataFrame([inv1, inv2])
-                df_fmt = df.rename(columns={
-                    "produto": "Produto",
-                    "prazo": "Prazo (dias)",
-                    "valor_investido": "Valor Investido",
-                    "valor_liquido": "Valor Líquido",
-                    "rentabilidade_anual": "Rentabilidade Anual (%)"
-                })
-                df_exibicao = df_fmt[["Produto", "Prazo (dias)", "Valor Investido", "Valor Líquido", "Rentabilidade Anual (%)"]].copy()
-                df_exibicao["Valor Investido"] = df_exibicao["Valor Investido"].apply(formatar_moeda)
-                df_exibicao["Valor Líquido"] = df_exibicao["Valor Líquido"].apply(formatar_moeda)
-                df_exibicao["Rentabilidade Anual (%)"] = df_exibicao["Rentabilidade Anual (%)"].apply(lambda x: f"{x:.2f}%")
+                df_exibicao = pd.DataFrame([
+                    {
+                        "Produto": inv["produto"],
+                        "Prazo (dias)": inv["prazo"],
+                        "Valor Investido": formatar_moeda(inv["valor_investido"]),
+                        "Valor Líquido": formatar_moeda(inv["valor_liquido"]),
+                        "Rentabilidade Anual (%)": f"{inv['rentabilidade_anual']:.2f}%"
+                    }
+                    for inv in (inv1, inv2)
+                ])
                 
                 st.dataframe(df_exibicao, hide_index=True, use_container_width=True)
                 melhor = "Investimento 1" if inv1["rentabilidade_anual"] > inv2["rentabilidade_anual"] else "Investimento 2"
@@ -227,6 +292,7 @@ with st.expander("💰 Configurações do Investimento", expanded=True):
             with col_secundaria:
                 fig = gerar_grafico(inv['valor_investido'], p[5], inv['prazo'], inv['produto'], inv['tipo'], p[6], p[7], p[8])
                 st.pyplot(fig)
+                plt.close(fig)
             
             with st.expander("🧾 Detalhes da Tributação e Custos"):
                 col1, col2 = st.columns(2)